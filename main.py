@@ -1,5 +1,9 @@
 import click
-import json
+
+try:
+    import orjson as json_parser
+except ImportError:
+    import json as json_parser
 
 from writers.statistics_m1 import StatisticsModule1
 
@@ -26,8 +30,8 @@ def main(module: str):
     assert module in MODULES or module == "all", f"There are no module named {module}"
 
     click.echo("===== 📝 Random Teacher =====")
-    with open("conf.json", "r") as file:
-        conf = json.load(file)
+    with open("conf.json", "rb") as file:
+        conf = json_parser.loads(file.read())
 
     if module == "all":
         click.echo("\tAll available modules are going to be generated.")
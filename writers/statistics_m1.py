@@ -20,21 +20,31 @@ If you want 20 samples per distribution:
     writer.write()
 """
 
-from collections import namedtuple, OrderedDict
+from collections import namedtuple
+import copy
 import re
 
 import docx
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.oxml.table import CT_Tbl
 import numpy as np
-from scipy import stats as st
-from scipy.stats import truncnorm
+from scipy.special import ndtr, ndtri
 
 from writers.writer_interface import DocumentWriterInterface
 
 
+QUESTION_TAGS_RE = re.compile("<b>|<i>")
+# standard normal CDF at the truncation bounds, for inverse CDF sampling
+TRUNC_CDF_LOW = ndtr(-6)
+TRUNC_CDF_RANGE = ndtr(6) - TRUNC_CDF_LOW
+
+
 class StatisticsModule1(DocumentWriterInterface):
     """Creates module_1 documents (student and teacher docs) for summary statistics."""
 
+    STAT_KEYS = ("mean", "median", "mode", "var", "std", "x_min", "x_max")
+
     def __init__(self, conf: dict) -> None:
         self.doc = docx.Document()
         self.conf = conf["STATISTICS_M1"]
@@ -44,21 +54,37 @@ class StatisticsModule1(DocumentWriterInterface):
         self.n_question_tables = self.conf["N_QUESTION_TABLES"]
         self.heading_text = self.conf["HEADING_TEXT"]
         self.question_text = self.conf["QUESTION_TEXT"]
+        self.question_fragments = [
+            (fragment, fragment[-2:])
+            for fragment in QUESTION_TAGS_RE.split(self.question_text)
+        ]
         self.footer_text = self.conf["FOOTER_TEXT"]
         self.intervals_mean = self.conf["INTERVALS_MEAN"]
         self.intervals_std = self.conf["INTERVALS_STD"]
         self.distribution_distance = self.conf["DISTRIBUTION_DISTANCE"]
         self.size = self.conf["DIST_SIZE"]
+        self.rng = np.random.default_rng()
 
         self.Dist = namedtuple("Distribution", "values target_mean target_std")
-        self.distributions = []
+        self.Answer = namedtuple("Answer", self.STAT_KEYS)
+        self.values_matrix = np.empty((0, self.size), dtype=np.int64)
+        self.target_means = np.empty(0, dtype=np.int64)
+        self.target_stds = np.empty(0, dtype=np.int64)
         self.answers = []
 
+    @property
+    def distributions(self) -> list:
+        """Distributions as a list of self.Dist namedtuples, built on demand."""
+        return [
+            self.Dist(*dist)
+            for dist in zip(self.values_matrix, self.target_means, self.target_stds)
+        ]
+
     def compute_questions_and_answers(self) -> None:
         self._create_distributions()
         self._create_answers()
         print(
-            f"\t{len(self.distributions)} new distributions were created with their solutions."
+            f"\t{len(self.target_means)} new distributions were created with their solutions."
         )
 
     def _create_distributions(self) -> None:
@@ -67,164 +93,224 @@ class StatisticsModule1(DocumentWriterInterface):
             self.intervals_mean["min"]
             + self.intervals_mean["step"] * self.n_question_tables
         )
-        for mean in range(
+        self.target_means = np.arange(
             self.intervals_mean["min"], max_i, self.intervals_mean["step"]
-        ):
-            std = np.random.randint(
-                self.intervals_std["min"], self.intervals_std["max"], 1
-            )[0]
-            dist_tup = self._create_dist_with_tolerance(
-                mean, std, self.distribution_distance, self.size
-            )
-            self.distributions.append(dist_tup)
+        )
+        self.target_stds = self.rng.integers(
+            self.intervals_std["min"], self.intervals_std["max"], self.target_means.size
+        )
+        self.values_matrix = self._create_dists_with_tolerance(
+            self.target_means,
+            self.target_stds,
+            self.distribution_distance,
+            self.size,
+        )
 
-    def _create_dist_with_tolerance(
+    def _create_dists_with_tolerance(
         self,
-        target_mean: int,
-        target_std: int,
+        target_means: np.ndarray,
+        target_stds: np.ndarray,
         max_distance: float = 2.0,
         size: int = 30,
-    ) -> namedtuple:
-        """Creates a random distribution near a mean target.
+        n_candidates: int = 30,
+    ) -> np.ndarray:
+        """Creates one random distribution near each mean target.
+
+        Draws `n_candidates` distributions per target in a single call and keeps
+        the first one close enough to the target mean, or the closest one if none
+        of them is.
 
         Args:
-            target_mean (int): mean target
-            target_std (int): std target. The real std may be far from the target value
+            target_means (np.ndarray): mean targets, one per distribution
+            target_stds (np.ndarray): std targets. The real std may be far from them
             max_distance (float, optional): max diff with target mean. Defaults to 2.0
             size (int, optional): number of samples in the distribution. Defaults to 30
+            n_candidates (int, optional): candidates drawn per target. Defaults to 30
 
         Returns:
-            namedtuple: distribution values, target mean and target std
+            np.ndarray: (n_distributions, size) matrix of distribution values
         """
-        count = 0
-        dist = self._create_int_normal_dist(target_mean, target_std, size)
-        mean = dist.mean()
-        distance = abs(target_mean - mean)
-        best_distance, alternative_dist = distance, dist
-        while distance >= max_distance and count < 30:
-            dist = self._create_int_normal_dist(target_mean, target_std, size)
-            mean = dist.mean()
-            distance = abs(target_mean - mean)
-            if best_distance > distance:
-                best_distance, alternative_dist = distance, dist
-            count += 1
-        if count == 30:
+        n_dists = target_means.size
+        candidates = self._create_int_normal_dist(
+            target_means[:, None, None],
+            target_stds[:, None, None],
+            (n_dists, n_candidates, size),
+        )
+        # samples are integers, so compare integer sums against the scaled target
+        # instead of computing the float mean of every candidate
+        deviations = np.abs(candidates.sum(axis=2) - target_means[:, None] * size)
+        accepted = deviations < max_distance * size
+        found = accepted.any(axis=1)
+        if not found.all():
             print("\tHard to find distribution. Giving the best option")
-            dist = alternative_dist
-        return self.Dist(dist, target_mean, target_std)
+        best = np.where(found, accepted.argmax(axis=1), deviations.argmin(axis=1))
+        return candidates[np.arange(n_dists), best]
 
-    def _create_int_normal_dist(self, mean: float, std: float, size: int) -> np.array:
-        """Creates a normal-like random distribution of integers.
+    def _create_int_normal_dist(
+        self, mean: np.ndarray, std: np.ndarray, size: tuple
+    ) -> np.ndarray:
+        """Creates normal-like random distributions of integers.
+
+        Samples are drawn from a standard normal truncated at ±6 with the inverse
+        CDF method: uniform draws are mapped into [cdf(-6), cdf(6)] and inverted.
+        Every step is done in place in a single float buffer.
 
         Args:
-            mean (float): target mean
-            std (float): target standard deviation
-            size (int): number of samples in the distribution
+            mean (np.ndarray): target means, broadcastable to `size`
+            std (np.ndarray): target standard deviations, broadcastable to `size`
+            size (tuple): shape of the output, (n_distributions, n_samples)
 
         Returns:
-            np.array: dist with a mean and std maybe similar to `std` and `mean`.
+            np.ndarray: dists with a mean and std maybe similar to `std` and `mean`.
         """
-        dist = truncnorm(a=-6, b=6, scale=1).rvs(size=size)
-        dist = dist.round().astype(int)
-        return std * dist + mean
+        dist = self.rng.random(size)
+        np.multiply(dist, TRUNC_CDF_RANGE, out=dist)
+        np.add(dist, TRUNC_CDF_LOW, out=dist)
+        ndtri(dist, out=dist)
+        np.rint(dist, out=dist)
+        return std * dist.astype(np.int64) + mean
 
     def _create_answers(self) -> None:
-        """Creates the answers list"""
+        """Creates the answers list.
+
+        Computes 7 summary statistics for all the distributions at once, reducing
+        over the rows of `values_matrix`. For the mode, if there is more than one,
+        retrieves just the smallest.
+        """
+        x = self.values_matrix
+        x_min = x.min(axis=1)
+        x_max = x.max(axis=1)
+        means = x.mean(axis=1).round(2)
+        medians = self._compute_medians(x)
+        variances = x.var(axis=1)
+        # std comes from the unrounded variance, both are rounded independently
+        stds = np.sqrt(variances).round(2)
+        variances = variances.round(2)
+        modes = self._compute_modes(x - x_min[:, None]) + x_min
         self.answers = [
-            self._create_one_answer(dist.values) for dist in self.distributions
+            self.Answer(*stats)
+            for stats in zip(means, medians, modes, variances, stds, x_min, x_max)
         ]
 
-    def _create_one_answer(self, x: np.array) -> OrderedDict:
-        """Computes summary statistics for a given array.
+    @staticmethod
+    def _compute_medians(x: np.ndarray) -> np.ndarray:
+        """Computes the median of each row of a matrix, truncated to integers.
 
-        For the mode, if there is more than one, retrieves just the smallest.
+        A linear selection of the middle elements is enough, no full sort needed.
 
         Args:
-            x (np.array): distribution of integers
+            x (np.ndarray): (n_distributions, size) matrix of integers
 
         Returns:
-            OrderedDict: returns 7 summary statistics
+            np.ndarray: the median of each row
         """
-        var = np.round(x.var(), 2)
-        return OrderedDict(
-            {
-                "mean": np.round(x.mean(), 2),
-                "median": int(np.median(x)),
-                "mode": st.mode(x)[0][0],
-                "var": var,
-                "std": np.round(np.sqrt(var), 2),
-                "x_min": x.min(),
-                "x_max": x.max(),
-            }
-        )
+        half = x.shape[1] // 2
+        if x.shape[1] % 2:
+            return np.partition(x, half, axis=1)[:, half]
+        ordered = np.partition(x, [half - 1, half], axis=1)
+        return ((ordered[:, half - 1] + ordered[:, half]) / 2).astype(int)
+
+    @staticmethod
+    def _compute_modes(x: np.ndarray) -> np.ndarray:
+        """Computes the smallest mode of each row of a non-negative integer matrix.
+
+        Each row is offset into its own range of bins, so a single bincount gives
+        the counts of every row.
+
+        Args:
+            x (np.ndarray): (n_distributions, size) matrix of non-negative integers
+
+        Returns:
+            np.ndarray: the mode of each row
+        """
+        n_rows = x.shape[0]
+        width = x.max(initial=0) + 1
+        offsets = np.arange(n_rows)[:, None] * width
+        counts = np.bincount((x + offsets).ravel(), minlength=n_rows * width)
+        # argmax returns the first maximum, i.e. the smallest mode
+        return counts.reshape(n_rows, width).argmax(axis=1)
 
     def create_questions_document(self) -> None:
         self.doc = docx.Document()
-        all_dist_values = [dist.values for dist in self.distributions]
+        all_dist_values = self.values_matrix.astype(int).tolist()
         heading = self.doc.add_heading(self.heading_text, 1)
         heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
         title_style = heading.style
         title_style.font.name = "Open Sans"
+        separator = " - " * 30
+        center = WD_ALIGN_PARAGRAPH.CENTER
+        template = self._create_question_table_template()
 
         for i in range(self.n_question_tables):
             para = self.doc.add_paragraph()
-            for fragment in re.split("<b>|<i>", self.question_text):
-                if fragment[-2:] == "*b":
+            for fragment, tag in self.question_fragments:
+                if tag == "*b":
                     para.add_run(fragment[:-2]).bold = True
-                elif fragment[-2:] == "*i":
+                elif tag == "*i":
                     para.add_run(fragment[:-2]).italic = True
                 else:
                     para.add_run(fragment)
 
-            table = self.doc.add_table(rows=1, cols=self.size + 1)
-            table.style = "Table Grid"
-            row = table.rows[0]
-            for j, cell in enumerate(row.cells):
-                if j == 0:
-                    cell.text = f"X_{i}"
-                    run = cell.paragraphs[0].runs[0]
-                    run.font.bold = True
-                else:
-                    value = all_dist_values[i][j - 1]
-                    cell.text = str(value)
+            table = copy.deepcopy(template)
+            row_texts = [f"X_{i}"] + list(map(str, all_dist_values[i]))
+            for text_element, text in zip(table.iter(qn("w:t")), row_texts):
+                text_element.text = text
+            para._p.addnext(table)
 
-            para = self.doc.add_paragraph(" - " * 30)
-            para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            para = self.doc.add_paragraph(separator)
+            para.alignment = center
         footer = self.doc.sections[0].footer
         para = footer.paragraphs[0]
         para.add_run(self.footer_text).italic = True
         self.doc.save(self.questions_path)
         print(f"\tQuestions saved in: {self.questions_path}")
 
+    def _create_question_table_template(self) -> CT_Tbl:
+        """Creates the XML of a question table to be cloned for every question.
+
+        The table has one row with a bold label cell and a cell per sample, each
+        with a single text element to be filled. Cloning this element avoids
+        building and styling a new table through python-docx for each question.
+
+        Returns:
+            CT_Tbl: `w:tbl` element detached from the document
+        """
+        table = self.doc.add_table(rows=1, cols=self.size + 1)
+        table.style = "Table Grid"
+        cells = table.rows[0].cells
+        for cell in cells:
+            cell.text = " "
+        cells[0].paragraphs[0].runs[0].font.bold = True
+        template = table._tbl
+        template.getparent().remove(template)
+        return template
+
     def create_solutions_document(self) -> None:
         self.doc = docx.Document()
         for i, answer in enumerate(self.answers):
-            dist = self.distributions[i]
-            name = f"{self.sol_table_name} {i} - target_mean {dist.target_mean} - target_std {dist.target_std}"
-            self._write_one_answer_table(dist, answer, name)
+            target_mean, target_std = self.target_means[i], self.target_stds[i]
+            name = (
+                f"{self.sol_table_name} {i} - target_mean {target_mean}"
+                f" - target_std {target_std}"
+            )
+            self._write_one_answer_table(answer, name)
         self.doc.save(self.solutions_path)
         print(f"\tAnswers saved in: {self.solutions_path}")
 
-    def _write_one_answer_table(
-        self, dist: namedtuple, answer: OrderedDict, name: str
-    ) -> None:
+    def _write_one_answer_table(self, answer: namedtuple, name: str) -> None:
         """Creates a single answer table.
 
         Args:
-            dist (namedtuple): a distribution expressed as a self.Dist namedtuple
-            answer (OrderedDict): a group of summary statistics
+            answer (namedtuple): summary statistics as a self.Answer namedtuple
             name (str): title fo the table
         """
         p1 = self.doc.add_paragraph()
         p1.add_run(name).italic = True
-        table = self.doc.add_table(rows=2, cols=len(answer))
+        table = self.doc.add_table(rows=2, cols=len(self.STAT_KEYS))
         table.style = "Table Grid"
-        keys = list(answer.keys())
-        for i, row in enumerate(table.rows):
-            for j, cell in enumerate(row.cells):
-                if i == 0:
-                    cell.text = keys[j]
-                    run = cell.paragraphs[0].runs[0]
-                    run.font.bold = True
-                else:
-                    cell.text = str(answer[keys[j]])
+        header, values = table.rows
+        for cell, key in zip(header.cells, self.STAT_KEYS):
+            cell.text = key
+            cell.paragraphs[0].runs[0].font.bold = True
+        for cell, value in zip(values.cells, answer):
+            cell.text = str(value)